@@ -7,18 +7,33 @@ from AWS S3 buckets. Focused on anonymous access for public GOES data.
 Author: SENAMHI
 """
 
+import os
+import re
+import mmap
 import s3fs
+import asyncio
 import numpy as np
-import concurrent.futures
+
+from fsspec.asyn import sync
 
 from pathlib import Path
 from datetime import datetime, timedelta, UTC
-from typing import List, Optional, Tuple, Union, Any
+from typing import AsyncIterator, List, Optional, Tuple, Union, Any
 
 # Default parameters
-DEFAULT_WORKERS = 6
+DEFAULT_WORKERS = 64
 TIME_DELAY = 12  # minutes
 DEFAULT_SATELLITE = 16
+DEFAULT_CHUNKSIZE = 16 * 2**20  # bytes per ranged GET
+DEFAULT_MAX_CONCURRENCY = 16  # ranged GETs in flight per file
+MAX_POOL_CONNECTIONS = 64
+LISTINGS_EXPIRY_TIME = 300  # seconds
+
+# Whole line of a newline-joined ASCII listing whose filename carries a
+# scan start _sYYYYDDDHHMMSS; groups: line, year, day, hour, minute
+TIMESTAMP_PATTERN = re.compile(
+    rb'(?m)^(.*?_s(\d{4})(\d{3})(\d{2})(\d{2})\d{2}.*)$'
+)
 
 DateInput = Union[str, List[str], Tuple[str, str]]
 DateRange = Tuple[datetime, datetime]
@@ -30,7 +45,7 @@ class GoesAWSDownloader:
     This class provides functionality to:
     - List available GOES satellite files on AWS S3
     - Filter files by date range and patterns
-    - Download files concurrently
+    - Download files concurrently on a single event loop
     - Process date inputs flexibly
 
     All AWS access is anonymous, suitable for public GOES data access.
@@ -40,7 +55,9 @@ class GoesAWSDownloader:
         start_date: Starting date for data retrieval
         end_date: Ending date for data retrieval
         all_files: Whether to retrieve all files in date range
-        workers: Number of concurrent download workers
+        workers: Maximum number of files downloaded concurrently
+        chunksize: Size in bytes of each ranged GET for large files
+        max_concurrency: Number of concurrent ranged GETs per file
         abi_level: ABI processing level (L1b or L2)
         fs: Anonymous S3 filesystem connection
         satellite: GOES satellite number (default 16)
@@ -60,21 +77,39 @@ class GoesAWSDownloader:
             date: Date or date range for data retrieval
             **kwargs: Additional configuration options
                 - all_files: Bool, retrieve all files
-                - workers: Int, concurrent download workers
+                - workers: Int, maximum concurrent file downloads
                 - satellite: Int, GOES satellite number
+                - chunksize: Int, bytes per ranged GET for large files
+                - max_concurrency: Int, concurrent ranged GETs per file
         """
         self.all_files = kwargs.get("all_files", False)
         self.workers = kwargs.get("workers", DEFAULT_WORKERS)
         self.satellite = kwargs.get("satellite", DEFAULT_SATELLITE)
+        self.chunksize = kwargs.get("chunksize", DEFAULT_CHUNKSIZE)
+        self.max_concurrency = kwargs.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
 
         self.product = product
         self.start_date, self.end_date = self._process_date_input(date)
 
         # Setup S3 connection
         self.abi_level = "L1b" if self.product == "RadF" else "L2"
-        self.fs = s3fs.S3FileSystem(anon=True)
+        # Files larger than chunksize are fetched as concurrent byte-range
+        # GETs, so the connection pool must allow that many open sockets
+        self.fs = s3fs.S3FileSystem(
+            anon=True,
+            config_kwargs={"max_pool_connections": MAX_POOL_CONNECTIONS},
+            use_listings_cache=True,
+            listings_expiry_time=LISTINGS_EXPIRY_TIME
+        )
         self.bucket_goes = f"noaa-goes{self.satellite}"
 
+        # Object sizes seen in listings, keyed by bucket/key path
+        self._size_cache: dict[str, int] = {}
+
+        # Download slots, created on first use and shared by every
+        # get_files/run call on this instance
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
     def _process_date_input(self, date: Optional[DateInput]) -> DateRange:
         """
         Process the input date and return start and end dates.
@@ -142,78 +177,173 @@ class GoesAWSDownloader:
                 "Formato de fecha inválido. Use '%Y%m%d%H%M', '%Y%m%d%H' o '%Y%m%d'."
             )
 
-    def list_available_files(self) -> Optional[np.ndarray]:
+    def list_available_files(self) -> Optional[List[str]]:
         """
         List available files in the specified S3 path.
 
         Returns:
-            np.ndarray: Array of available file paths or None if no files found
+            list: Available file paths or None if no files found
         """
-        if self.start_date.replace(tzinfo=None) > datetime.now(UTC).replace(tzinfo=None):
-            print("\t[ ERROR ] Fecha ingresada mayor a la actual.")
+        s3_links = self._hourly_links()
+        if s3_links is None:
             return None
 
         all_files_list = []
-        current_date = self.start_date
+        for s3_list in sync(self.fs.loop, self._ls_async, s3_links):
+            if isinstance(s3_list, Exception):
+                print("\t[ WARNING ] Sin ficheros encontrados.")
+                continue
+            all_files_list.extend(self._register_listing(s3_list))
+
+        return all_files_list
+
+    def _hourly_links(self) -> Optional[List[str]]:
+        """
+        Build the S3 prefix of every hour in the date range.
+
+        Returns:
+            list: One S3 prefix per hour, or None if the range starts in the future
+        """
+        if self.start_date.replace(tzinfo=None) > datetime.now(UTC).replace(tzinfo=None):
+            print("\t[ ERROR ] Fecha ingresada mayor a la actual.")
+            return None
 
         s3_path = f"{self.bucket_goes}/ABI-{self.abi_level}-{self.product}"
-        while current_date <= self.end_date:
-            s3_link = f"s3://{s3_path}/{current_date:%Y/%j/%H}"
+        n_hours = (self.end_date - self.start_date) // timedelta(hours=1) + 1
+        return [
+            f"s3://{s3_path}/{self.start_date + timedelta(hours=k):%Y/%j/%H}"
+            for k in range(n_hours)
+        ]
+
+    def _register_listing(self, s3_list: List[dict]) -> List[str]:
+        """
+        Record object sizes from a detailed listing and return the file paths.
 
+        Sizes come in the same response as the names, so keeping them spares
+        download() a HEAD request per file.
+
+        Args:
+            s3_list: Detailed listing as returned by `fs._ls(..., detail=True)`
+
+        Returns:
+            list: File paths in the listing
+        """
+        for entry in s3_list:
+            self._size_cache[entry["name"]] = entry["size"]
+        return [entry["name"] for entry in s3_list]
+
+    async def _ls_async(self, s3_links: List[str]) -> List[Any]:
+        """
+        List several S3 prefixes concurrently.
+
+        Args:
+            s3_links: S3 prefixes to list, one per hour
+
+        Returns:
+            list: One detailed listing per prefix, in input order, or the
+                exception raised while listing it
+        """
+        return await asyncio.gather(
+            *(self.fs._ls(s3_link, detail=True) for s3_link in s3_links),
+            return_exceptions=True
+        )
+
+    async def stream_files(self) -> AsyncIterator[List[str]]:
+        """
+        Yield the files of each hourly prefix as soon as its listing arrives.
+
+        Yields:
+            list: File paths of one hourly prefix
+        """
+        s3_links = self._hourly_links()
+        if s3_links is None:
+            return
+
+        listings = [self.fs._ls(s3_link, detail=True) for s3_link in s3_links]
+        for listing in asyncio.as_completed(listings):
             try:
-                s3_list = np.array(self.fs.ls(s3_link))
-                if s3_list.size > 0:
-                    all_files_list.extend(s3_list)
-            except Exception as e:
+                s3_list = await listing
+            except Exception:
                 print("\t[ WARNING ] Sin ficheros encontrados.")
-            current_date += timedelta(hours=1)
+                continue
+            yield self._register_listing(s3_list)
+
+    async def filter_stream(
+        self,
+        source: AsyncIterator[List[str]],
+        pattern: Optional[List[str]] = None,
+        interval: int = 10
+    ) -> AsyncIterator[str]:
+        """
+        Apply `filter_files` to each batch of a file stream.
 
-        return np.array(all_files_list)
+        Args:
+            source: Async iterator of file path batches, e.g. `stream_files()`
+            pattern: List of patterns to match
+            interval: Time interval for filtering (minutes)
+
+        Yields:
+            str: File paths that pass the filter
+        """
+        async for files in source:
+            for filename in self.filter_files(files, pattern, interval):
+                yield filename
 
     def filter_files(
         self,
-        all_files: np.ndarray,
+        all_files: List[str],
         pattern: Optional[List[str]] = None,
         interval: int = 10
-    ) -> np.ndarray:
+    ) -> List[str]:
         """
         Filter files based on pattern and time interval.
 
         Args:
-            all_files: Array of file paths to filter
-            pattern: List of patterns to match
+            all_files: File paths to filter
+            pattern: List of patterns to match; a file is kept if it contains
+                any of them, so an empty list keeps no files
             interval: Time interval for filtering (minutes)
 
         Returns:
-            np.ndarray: Filtered array of file paths
+            list: Filtered file paths, in input order
         """
-        import re
-        from numpy.core.defchararray import find
-
         # Filter files containing pattern
         if pattern is not None:
-            files = []
-            for p in pattern:
-                files.extend(all_files[find(all_files, p) != -1])
+            # An empty alternation would compile to "" and match every file
+            if not pattern:
+                return []
+            needle = re.compile("|".join(map(re.escape, pattern)))
+            files = [file for file in all_files if needle.search(file)]
         else:
             files = all_files
 
-        # Extract timestamp from each file
-        filtered_files = []
-        for file in files:
-            match = re.search(r'_s(\d{4})(\d{3})(\d{2})(\d{2})(\d{2})', file)
-            if match:
-                year, day_of_year, hour, minute, second = map(int, match.groups())
-                total_minutes = hour * 60 + minute
-                
-                # Create datetime objext from components
-                file_date = datetime.strptime(f"{year}{day_of_year}{hour}{minute}",
-                                              "%Y%j%H%M")
-                
-                if (self.start_date.replace(tzinfo=None) <= file_date <= self.end_date.replace(tzinfo=None) and total_minutes % interval == 0):  # Verificar si cae en el intervalo deseado
-                    filtered_files.append(file)
-
-        return np.array(filtered_files)
+        # Extract timestamps with one regex pass over the listing as bytes;
+        # fixed-width bytes are 4x narrower than NumPy unicode strings. S3
+        # keys are ASCII, but local paths may not be, so encode as UTF-8
+        # (surrogateescape keeps undecodable file names round-tripping)
+        found = TIMESTAMP_PATTERN.findall(
+            "\n".join(files).encode("utf-8", "surrogateescape")
+        )
+        if not found:
+            return []
+
+        # Columns: file, year, day of year, hour, minute
+        found = np.array(found)
+        year, day_of_year, hour, minute = found[:, 1:].astype(np.int64).T
+        total_minutes = hour * 60 + minute
+
+        # Minute-resolution datetime64 of each file
+        file_days = (year - 1970).astype('datetime64[Y]').astype('datetime64[D]') + (day_of_year - 1)
+        file_dates = file_days + total_minutes.astype('timedelta64[m]')
+
+        start = np.datetime64(self.start_date.replace(tzinfo=None), 'm')
+        end = np.datetime64(self.end_date.replace(tzinfo=None), 'm')
+        mask = (
+            (file_dates >= start)
+            & (file_dates <= end)
+            & (total_minutes % interval == 0)  # Verificar si cae en el intervalo deseado
+        )
+        return [file.decode("utf-8", "surrogateescape") for file in found[mask, 0]]
 
     def download(
         self,
@@ -224,6 +354,25 @@ class GoesAWSDownloader:
         """
         Download a file from S3 to local path.
 
+        Args:
+            filename: S3 file path to download
+            local_path: Local directory to save file
+            force: Whether to force download if file exists
+
+        Returns:
+            str: Local file path if download successful, None otherwise
+        """
+        return sync(self.fs.loop, self._download_async, filename, local_path, force)
+
+    async def _download_async(
+        self,
+        filename: str,
+        local_path: Union[str, Path] = "./",
+        force: bool = False
+    ) -> Optional[str]:
+        """
+        Coroutine behind `download`, run on the filesystem event loop.
+
         Args:
             filename: S3 file path to download
             local_path: Local directory to save file
@@ -233,25 +382,81 @@ class GoesAWSDownloader:
             str: Local file path if download successful, None otherwise
         """
         local_path = Path(local_path)
-        local_path.parent.mkdir(parents=True, exist_ok=True)
+        local_path.mkdir(parents=True, exist_ok=True)
         local_file = local_path / Path(filename).name
 
-        if local_file.exists() and not force:
-            local_size = local_file.stat().st_size
-            aws_size = self.fs.info(filename)["size"]
+        try:
+            aws_size = self._size_cache.get(self.fs._strip_protocol(filename))
+            if aws_size is None:
+                aws_size = (await self.fs._info(filename))["size"]
 
-            if aws_size <= local_size:
-                print(f"\t[ COMPLETE ] El archivo ya existe y está completo: {Path(filename).name}")
-                return None
+            if local_file.exists() and not force:
+                if aws_size <= local_file.stat().st_size:
+                    print(f"\t[ COMPLETE ] El archivo ya existe y está completo: {Path(filename).name}")
+                    return None
 
-        try:
-            self.fs.get(filename, str(local_file))
+            await self._fetch_into(filename, local_file, aws_size)
             print(f"\t[ NEW ] Descarga completada: {local_file}")
             return str(local_file)
         except Exception as e:
             print(f"\t[ ERROR ] Error al descargar {Path(filename).name}: {e}")
             return None
 
+    async def _fetch_into(self, filename: str, local_file: Path, size: int) -> None:
+        """
+        Download `filename` into a preallocated, memory-mapped local file.
+
+        Ranged GETs of `chunksize` bytes run concurrently (at most
+        `max_concurrency` per file) and each one is written in place at its
+        offset, so no intermediate buffer or sequential write loop is needed.
+
+        Args:
+            filename: S3 file path to download
+            local_file: Local file to create
+            size: Size of the remote object in bytes
+
+        Raises:
+            Exception: The first error of a failed ranged GET; the partially
+                written file is removed before re-raising.
+        """
+        fd = os.open(local_file, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if size == 0:
+                return
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+
+            with mmap.mmap(fd, size, access=mmap.ACCESS_WRITE) as mm:
+                limit = asyncio.Semaphore(self.max_concurrency)
+
+                async def fetch(start: int) -> None:
+                    end = min(start + self.chunksize, size)
+                    async with limit:
+                        mm[start:end] = await self.fs._cat_file(filename, start=start, end=end)
+
+                # TaskGroup cancels the remaining ranges as soon as one fails
+                # and waits for them, so nothing writes into a closed mapping
+                try:
+                    async with asyncio.TaskGroup() as tg:
+                        for start in range(0, size, self.chunksize):
+                            tg.create_task(fetch(start))
+                except ExceptionGroup as eg:
+                    raise eg.exceptions[0]
+
+                mm.flush()
+                # Written pages are on disk now; keep them out of the page cache
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    mm.madvise(mmap.MADV_DONTNEED)
+        except BaseException:
+            # A preallocated file already has its final size; drop it so the
+            # next run does not mistake it for a complete download.
+            local_file.unlink(missing_ok=True)
+            raise
+        finally:
+            os.close(fd)
+
     def get_files(
         self,
         filenames: List[str],
@@ -260,19 +465,121 @@ class GoesAWSDownloader:
         """
         Download multiple files concurrently.
 
+        All downloads are multiplexed on the filesystem event loop, with at
+        most `workers` files in flight at once across all calls.
+
         Args:
             filenames: List of S3 file paths to download
             local_path: Local directory to save files
         """
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
-            futures = {
-                executor.submit(self.download, filename, local_path): filename
-                for filename in filenames
-            }
-            for future in concurrent.futures.as_completed(futures):
-                filename = Path(futures[future]).name
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"\t[ERROR] {filename} {e}")
+        sync(self.fs.loop, self._get_files_async, filenames, local_path)
+
+    async def _get_files_async(
+        self,
+        filenames: List[str],
+        local_path: Union[str, Path] = "./"
+    ) -> None:
+        """
+        Coroutine behind `get_files`.
+
+        Args:
+            filenames: List of S3 file paths to download
+            local_path: Local directory to save files
+        """
+        tasks = {
+            asyncio.ensure_future(
+                self._bounded_download(filename, local_path)
+            ): filename
+            for filename in filenames
+        }
+        await self._wait_downloads(tasks)
+
+    def run(
+        self,
+        local_path: Union[str, Path] = "./",
+        pattern: Optional[List[str]] = None,
+        interval: int = 10
+    ) -> None:
+        """
+        List, filter and download the date range as a single pipeline.
+
+        Each hourly listing is filtered as soon as it arrives and its matches
+        start downloading right away, so listing round-trips overlap with
+        transfers instead of preceding them.
+
+        Args:
+            local_path: Local directory to save files
+            pattern: List of patterns to match
+            interval: Time interval for filtering (minutes)
+        """
+        sync(self.fs.loop, self._run_async, local_path, pattern, interval)
+
+    async def _run_async(
+        self,
+        local_path: Union[str, Path] = "./",
+        pattern: Optional[List[str]] = None,
+        interval: int = 10
+    ) -> None:
+        """
+        Coroutine behind `run`.
+
+        Args:
+            local_path: Local directory to save files
+            pattern: List of patterns to match
+            interval: Time interval for filtering (minutes)
+        """
+        tasks = {}
+        async for filename in self.filter_stream(self.stream_files(), pattern, interval):
+            task = asyncio.ensure_future(
+                self._bounded_download(filename, local_path)
+            )
+            tasks[task] = filename
+        await self._wait_downloads(tasks)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """
+        Download slots shared by all calls on this instance.
+
+        Overlapping get_files/run calls draw from the same `workers` slots
+        instead of each opening its own. Created lazily so that it is first
+        used on the filesystem event loop; `workers` changes made after that
+        have no effect.
+
+        Returns:
+            asyncio.Semaphore: Semaphore sized to `workers`
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
 
+    async def _bounded_download(
+        self,
+        filename: str,
+        local_path: Union[str, Path] = "./"
+    ) -> Optional[str]:
+        """
+        Download a file once a download slot is free.
+
+        Args:
+            filename: S3 file path to download
+            local_path: Local directory to save file
+
+        Returns:
+            str: Local file path if download successful, None otherwise
+        """
+        async with self.semaphore:
+            return await self._download_async(filename, local_path)
+
+    @staticmethod
+    async def _wait_downloads(tasks: dict) -> None:
+        """
+        Wait for download tasks and report the ones that raised.
+
+        Args:
+            tasks: Mapping of download task to S3 file path
+        """
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for filename, result in zip(tasks.values(), results):
+            if isinstance(result, Exception):
+                print(f"\t[ERROR] {Path(filename).name} {result}")
@@ -5,7 +5,7 @@ This module provides the TIFReader class, which can read TIFF files and extract
 based on specified geographic extents.
 """
 import rasterio
-from rasterio.windows import from_bounds
+from rasterio.windows import Window, from_bounds
 
 class TIFReader:
     """
@@ -29,30 +29,33 @@ class TIFReader:
 
     def read(self, file, extent=None):
         """
-        Reads data from a TIFF file and extracts it based on the extent.
+        Reads data from a TIFF file, limited to the extent if one is given.
+
+        Only the window covering the extent is read from disk.
 
         Args:
             file (str): The path to the TIFF file.
             extent (list, optional): The geographical extent to extract. Defaults to None.
 
         Returns:
-            tuple: A tuple containing the data and its full extent.
+            tuple: A tuple containing the data and its extent.
         """
         with rasterio.open(file) as src:
-            # Data from tif
-            data = src.read(1)
-            transform = src.transform
+            if extent is None:
+                data = src.read(1)
+                return data, self.get_extent(src.transform, src.width, src.height)
+
+            # Whole-pixel window of the extent, clipped to the raster bounds
+            window = from_bounds(extent[0], extent[2], extent[1], extent[3],
+                                 transform=src.transform)
+            window = window.round_offsets().round_lengths()
+            window = window.intersection(Window(0, 0, src.width, src.height))
 
-            # Get extent
-            full_extent = self.get_extent(transform,
-                                src.width,
-                                src.height)
-            
-            # Subarea
-            if not extent is None:
-                data, extent = self.subarea(data, full_extent)
-            
-            return data, full_extent
+            data = src.read(1, window=window)
+            sub_extent = self.get_extent(src.window_transform(window),
+                                         window.width,
+                                         window.height)
+            return data, sub_extent
     
     def get_extent(self, transform, width, height):
         """
@@ -74,27 +77,3 @@ class TIFReader:
             transform.f     # Lat max
         ]
         return extent
-
-    def subarea(self, extent):
-        """
-        Extracts a subarea from the data based on the given extent.
-
-        Args:
-            extent (list): The geographical extent to extract.
-
-        Returns:
-            tuple: A tuple containing the subarea data and its extent.
-        """
-        sub_latn = extent[2] if self.extent[2]<extent[2] else self.extent[2]
-        sub_latx = extent[3] if self.extent[3]>extent[3] else self.extent[3]
-        sub_lonn = extent[0] if self.extent[0]<extent[0] else self.extent[0]
-        sub_lonx = extent[1] if self.extent[1]>extent[1] else self.extent[1]
-
-        extent = [sub_lonn, sub_lonx, sub_latn, sub_latx]
-        
-
-        start_col = int((sub_lonn - self.extent[0])/(self.extent[1]-self.extent[0])*self.data.shape[1])
-        start_row = int((self.extent[3] - sub_latx)/(self.extent[3]-self.extent[2])*self.data.shape[0])
-        end_col = int((sub_lonx - self.extent[0])/(self.extent[1]-self.extent[0])*self.data.shape[1])
-        end_row = int((self.extent[3] - sub_latn)/(self.extent[3]-self.extent[2])*self.data.shape[0])
-        return self.data[start_row:end_row, start_col:end_col], extent
@@ -1,15 +1,63 @@
 import os
 import numpy as np
-from datetime import datetime, timezone
+import numexpr as ne
+from datetime import datetime
 from osgeo import osr, gdal
-import cartopy.crs as ccrs
-from netCDF4 import Dataset
+import xarray as xr
+from functools import cached_property, lru_cache
+from pyproj import Transformer
+from scipy.ndimage import map_coordinates
 from ..utils.solar import calculate_cos_theta, calculate_sun_zenith
 
+TARGET_PROJ4 = '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs'
+
+# Cada entrada retiene dos arrays float32 del tamaño de la salida (cientos de
+# MB en mallas grandes); bastan dos para alternar entre un par de dominios
+@lru_cache(maxsize=2)
+def _warp_indices(extent, sizex, sizey, geos_proj4, x0, dx, y0, dy):
+    """
+    Calcula, para cada pixel de la malla PlateCarree de salida, su posición
+    fraccionaria (fila, columna) en la imagen GOES.
+    
+    Args:
+        extent (tuple): (xmin, xmax, ymin, ymax) de la salida
+        sizex (int): Número de columnas de la salida
+        sizey (int): Número de filas de la salida
+        geos_proj4 (str): Proyección geoestacionaria de la imagen
+        x0, dx (float): Primera coordenada x y paso en metros
+        y0, dy (float): Primera coordenada y y paso en metros
+    
+    Returns:
+        tuple: Arrays (filas, columnas) de forma (sizey, sizex), solo lectura
+    """
+    resx = (extent[1] - extent[0])/sizex
+    resy = (extent[3] - extent[2])/sizey
+    lon = extent[0] + (np.arange(sizex) + 0.5)*resx
+    lat = extent[3] - (np.arange(sizey) + 0.5)*resy
+    lons, lats = np.meshgrid(lon, lat)
+    
+    transformer = Transformer.from_crs(TARGET_PROJ4, geos_proj4, always_xy=True)
+    x, y = transformer.transform(lons, lats)
+    
+    rows = ((y - y0)/dy).astype(np.float32)
+    cols = ((x - x0)/dx).astype(np.float32)
+    # Puntos fuera del disco terrestre: se envían fuera de la imagen
+    outside = ~(np.isfinite(rows) & np.isfinite(cols))
+    rows[outside] = cols[outside] = -2
+    
+    rows.flags.writeable = cols.flags.writeable = False
+    return rows, cols
+
 class GOESReproject:
     """
     Clase para manejar la reproyección de imágenes GOES-16 a proyección PlateCarree.
     Basada en el procesamiento de imágenes GOES-16 del SENAMHI.
+
+    Mantiene el archivo abierto hasta llamar a `close`; se puede usar como
+    gestor de contexto:
+
+        with GOESReproject(path) as goes:
+            goes.reproject('CMI', extent)
     """
     def __init__(self, file_path):
         """
@@ -19,17 +67,38 @@ class GOESReproject:
             file_path (str): Ruta al archivo GOES-16 NetCDF
         """
         self.filename = file_path
-        self.file = Dataset(file_path)
-        self.date = datetime.strptime(
-            self.file.time_coverage_start, 
-            '%Y-%m-%dT%H:%M:%S.%fZ'
-        )
-        self.date = self.date.replace(tzinfo=timezone.utc)
+        # Lectura perezosa: los chunks se descomprimen en paralelo con dask
+        # recién al acceder a los valores
+        self.ds = xr.open_dataset(file_path, engine='h5netcdf', chunks='auto')
+        # fromisoformat interpreta el sufijo 'Z' como UTC (Python >= 3.11)
+        self.date = datetime.fromisoformat(self.ds.attrs['time_coverage_start'])
         self.projection = self._proj_info()
         self.xy_resolution = float(
-            self.file.spatial_resolution.split('km')[0]
+            self.ds.attrs['spatial_resolution'].split('km')[0]
         )
         self.product = os.path.basename(file_path).split('_')[1]
+
+    @cached_property
+    def band(self):
+        """
+        Número de banda ABI, leído al primer uso. None si el archivo no tiene
+        la variable `band_id` (p. ej. MCMIP o productos L2 derivados).
+        """
+        if 'band_id' not in self.ds:
+            return None
+        return int(self.ds['band_id'].values[0])
+
+    def close(self):
+        """
+        Cierra el archivo NetCDF.
+        """
+        self.ds.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
     def _proj_info(self):
         """
@@ -38,16 +107,11 @@ class GOESReproject:
         Returns:
             dict: Información de proyección
         """
-        proj_info = {
-            attrname: getattr(
-                self.file.variables['goes_imager_projection'], 
-                attrname
-            ) for attrname in self.file.variables['goes_imager_projection'].ncattrs()
-        }
+        proj_info = dict(self.ds['goes_imager_projection'].attrs)
         
-        self.x = self.file.variables['x']
-        self.y = self.file.variables['y']
-        x, y = self.x[:], self.y[:]
+        self.x = self.ds['x']
+        self.y = self.ds['y']
+        x, y = self.x.values, self.y.values
         height = proj_info['perspective_point_height']
         
         proj_info['image_extent'] = [
@@ -65,13 +129,35 @@ class GOESReproject:
             skip (int): Factor de sub-muestreo
         
         Returns:
-            numpy.ndarray: Datos de la variable
+            numpy.ndarray: Datos de la variable (NaN en los valores de relleno)
+        """
+        rows, cols = self._data_slices(skip)
+        return self.ds[variable].isel(y=rows, x=cols).values
+
+    def get_shape(self, variable, skip=1):
+        """
+        Obtiene la forma que tendría `get_data` sin leer los datos.
+        
+        Args:
+            variable (str): Nombre de la variable
+            skip (int): Factor de sub-muestreo
+        
+        Returns:
+            tuple: (filas, columnas)
+        """
+        nrows, ncols = self.ds[variable].shape
+        rows, cols = self._data_slices(skip)
+        return (len(range(*rows.indices(nrows))),
+                len(range(*cols.indices(ncols))))
+
+    def _data_slices(self, skip=1):
+        """
+        Slices de filas y columnas que aplica `get_data`.
         """
         if 'extent' in self.projection:
             llx, urx, lly, ury = self.projection['extent']
-            return self.file.variables[variable][ury:lly:skip, llx:urx:skip]
-        else:
-            return self.file.variables[variable][::skip, ::skip]
+            return slice(ury, lly, skip), slice(llx, urx, skip)
+        return slice(None, None, skip), slice(None, None, skip)
 
     def _get_geotransform(self, extent, nrows, ncols):
         """
@@ -89,6 +175,26 @@ class GOESReproject:
         resy = (extent[3] - extent[2])/nrows
         return [extent[0], resx, 0, extent[3], 0, -resy]
 
+    def _geos_proj4(self):
+        """
+        Construye la definición PROJ de la proyección geoestacionaria.
+        
+        Returns:
+            str: Cadena PROJ de la proyección del archivo
+        """
+        info = {
+            key: np.ravel(self.projection[key])[0]
+            for key in ('perspective_point_height', 'semi_major_axis',
+                        'semi_minor_axis', 'longitude_of_projection_origin',
+                        'sweep_angle_axis')
+        }
+        return (
+            f"+proj=geos +h={info['perspective_point_height']} "
+            f"+a={info['semi_major_axis']} +b={info['semi_minor_axis']} "
+            f"+lon_0={info['longitude_of_projection_origin']} "
+            f"+sweep={info['sweep_angle_axis']} +units=m +no_defs"
+        )
+
     def reproject(self, variable, target_extent, resolution=None, 
                 output_format=None, output_path='./', filename=None):
         """
@@ -107,17 +213,10 @@ class GOESReproject:
         """
         gdal.PushErrorHandler('CPLQuietErrorHandler')
         
-        # Configurar proyección de salida
+        # Configurar proyección de salida; cartopy se importa aquí y no al
+        # importar el módulo, porque su carga es lenta
+        import cartopy.crs as ccrs
         self.projection['MapProject'] = ccrs.PlateCarree()
-        raw = gdal.Open(f'NETCDF:{self.filename}:{variable}')
-        metadata = raw.GetMetadata()
-        
-        # Obtener factores de escala y offset
-        if variable == 'DQF':
-            scale, offset = 1, 0
-        else:
-            scale = float(metadata.get(variable + '#scale_factor'))
-            offset = float(metadata.get(variable + '#add_offset'))
         
         # Calcular dimensiones de salida
         if resolution is not None:
@@ -125,53 +224,34 @@ class GOESReproject:
             sizex = int((target_extent[1]-target_extent[0])*KM_PER_DEGREE/resolution)
             sizey = int((target_extent[3]-target_extent[2])*KM_PER_DEGREE/resolution)
         else:
-            sizex = self.get_data(variable).shape[0]
-            sizey = self.get_data(variable).shape[1]
+            sizex, sizey = self.get_shape(variable)
 
-        # Configurar sistemas de referencia
-        source_proj = osr.SpatialReference()
-        source_proj.ImportFromProj4(raw.GetProjectionRef())
-        
-        target_proj = osr.SpatialReference()
-        target_proj.ImportFromProj4(
-            '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs'
+        # Índices de la imagen GOES para cada pixel de salida; dependen solo
+        # de la malla, por lo que se reutilizan entre archivos
+        height = float(np.ravel(self.projection['perspective_point_height'])[0])
+        x, y = self.x.values * height, self.y.values * height
+        rows, cols = _warp_indices(
+            tuple(map(float, target_extent)), sizex, sizey,
+            self._geos_proj4(),
+            float(x[0]), float(x[1] - x[0]), float(y[0]), float(y[1] - y[0])
         )
         
-        # Crear grid de salida
-        driver = gdal.GetDriverByName('MEM')
-        grid = driver.Create('grid', sizex, sizey, 1, gdal.GDT_Float32)
-        grid.SetProjection(target_proj.ExportToWkt())
-        
-        geotransform = self._get_geotransform(
-            target_extent, 
-            grid.RasterYSize, 
-            grid.RasterXSize
-        )
-        grid.SetGeoTransform(geotransform)
-        
-        # Reproyectar
-        gdal.ReprojectImage(
-            raw, grid,
-            source_proj.ExportToWkt(),
-            target_proj.ExportToWkt(),
-            gdal.GRA_NearestNeighbour,
-            options=['NUM_THREADS=ALL_CPUS']
+        # Reproyectar (vecino más cercano para DQF, que es categórico)
+        data = map_coordinates(
+            self.ds[variable].values, [rows, cols],
+            order=0 if variable == 'DQF' else 1,
+            mode='constant', cval=0, output=np.float32
         )
         
         # Procesar datos
-        data = grid.ReadAsArray()
-        data = data * scale + offset
-        
         if variable == 'Rad':
             data = self._process_radiance(data, target_extent)
         elif variable == 'CMI':
             data = self._process_cmi(data)
-        
-        grid.GetRasterBand(1).SetNoDataValue(-1)
-        grid.GetRasterBand(1).WriteArray(data)
 
         # Exportar si se especifica
         if output_format:
+            grid = self._to_dataset(data, target_extent)
             out_path = self._export_data(
                 grid, data, output_format, output_path, 
                 filename, target_extent
@@ -180,29 +260,59 @@ class GOESReproject:
         
         return {"data": data}
 
+    def _to_dataset(self, data, extent):
+        """
+        Crea un dataset GDAL en memoria con los datos reproyectados.
+        
+        Args:
+            data (numpy.ndarray): Datos reproyectados
+            extent (list): [xmin, xmax, ymin, ymax]
+        
+        Returns:
+            gdal.Dataset: Dataset MEM georreferenciado en PlateCarree
+        """
+        target_proj = osr.SpatialReference()
+        target_proj.ImportFromProj4(TARGET_PROJ4)
+        
+        driver = gdal.GetDriverByName('MEM')
+        grid = driver.Create('grid', data.shape[1], data.shape[0], 1, gdal.GDT_Float32)
+        grid.SetProjection(target_proj.ExportToWkt())
+        grid.SetGeoTransform(
+            self._get_geotransform(extent, grid.RasterYSize, grid.RasterXSize)
+        )
+        grid.GetRasterBand(1).SetNoDataValue(-1)
+        grid.GetRasterBand(1).WriteArray(data)
+        return grid
+
     def _process_radiance(self, data, extent):
         """
         Procesa datos de radiancia.
         """
-        band = self.file.variables['band_id'][:][0]
+        band = self.band
         if band in range(1, 7):
-            kappa = self.file.variables['kappa0'][:]
-            data = kappa * data
-            cos_theta_values = calculate_cos_theta(
+            kappa = np.float32(self.ds['kappa0'].values)
+            cos_theta = calculate_cos_theta(
                 self.date, extent, data
+            ).astype(np.float32, copy=False)
+            # Reflectancia corregida en porcentaje [0, 100]; los pixeles
+            # sin iluminación (cos_theta NaN) quedan en 0
+            data_cor = ne.evaluate(
+                "where(kappa * data / cos_theta > 0,"
+                " where(kappa * data / cos_theta > 1, 1,"
+                " kappa * data / cos_theta), 0) * 100",
+                local_dict={"kappa": kappa, "data": data, "cos_theta": cos_theta}
             )
-            data_cor = data/cos_theta_values
-            data_cor = np.clip(data_cor, 0, 1)
-            data_cor = data_cor * 100
-            return data_cor.astype(np.int16)
+            return data_cor.astype(np.uint8)
         elif band in range(7, 17):
-            planck = [
-                self.file.variables['planck_fk1'][:],
-                self.file.variables['planck_fk2'][:],
-                self.file.variables['planck_bc1'][:],
-                self.file.variables['planck_bc2'][:]
-            ]
-            data = (planck[1]/(np.log((planck[0]/data)+1)) - planck[2])/planck[3]
+            # Coeficientes en float32 para que numexpr no promueva a float64
+            planck = {
+                name: np.float32(self.ds[f'planck_{name}'].values)
+                for name in ('fk1', 'fk2', 'bc1', 'bc2')
+            }
+            data = ne.evaluate(
+                "(fk2 / log(fk1 / data + 1) - bc1) / bc2",
+                local_dict={"data": data, **planck}
+            )
             return data.astype(np.float16)
         return data
 
@@ -210,7 +320,7 @@ class GOESReproject:
         """
         Procesa datos CMI.
         """
-        band = self.file.variables['band_id'][:][0]
+        band = self.band
         if band in range(1, 7):
             data = data * 100
             return data.astype(np.uint8)
@@ -243,7 +353,15 @@ class GOESReproject:
         
         elif output_format == 'GTiff':
             driver = gdal.GetDriverByName(output_format)
-            export_options = ['COMPRESS=DEFLATE']
+            # Predictor: diferencia horizontal (2) en enteros, de punto
+            # flotante (3) en reales
+            data_type = grid.GetRasterBand(1).DataType
+            predictor = 3 if data_type in (gdal.GDT_Float32, gdal.GDT_Float64) else 2
+            export_options = [
+                'COMPRESS=ZSTD', 'ZSTD_LEVEL=1', f'PREDICTOR={predictor}',
+                'TILED=YES', 'BLOCKXSIZE=512', 'BLOCKYSIZE=512',
+                'NUM_THREADS=ALL_CPUS'
+            ]
             driver.CreateCopy(out_path, grid, 0, options=export_options)
             
             cols, rows = data.shape
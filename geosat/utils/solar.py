@@ -5,29 +5,35 @@ y reflectancia para imágenes GOES-16.
 """
 
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from scipy.ndimage import zoom
 from pyorbital import astronomy
 from pyspectral.near_infrared_reflectance import Calculator
 
-def calculate_sun_zenith(fecha, extent, data):
+MIN_COARSE = 64  # nodos mínimos por eje de la malla reducida
+
+def calculate_sun_zenith(fecha, extent, data, coarse_factor=16):
     """
     Calcula el ángulo cenital solar para una región y tiempo específicos.
+
+    El ángulo varía suavemente en el espacio, por lo que se evalúa en una
+    malla reducida y se interpola bilinealmente a la resolución de `data`.
+    La fecha se redondea al minuto y la malla reducida se memoriza, de modo
+    que los archivos de un mismo lote sobre la misma región la reutilizan.
     
     Args:
         fecha (datetime): Fecha y hora UTC
         extent (list): [xmin, xmax, ymin, ymax] - Extensión geográfica
         data (numpy.ndarray): Array 2D con los datos para obtener dimensiones
+        coarse_factor (int): Separación en pixeles de la malla reducida
+            (1 evalúa el ángulo en cada pixel)
     
     Returns:
         numpy.ndarray: Ángulo cenital solar para cada pixel
     """
-    print(fecha)
-    lat = np.linspace(extent[3], extent[2], data.shape[0])
-    lon = np.linspace(extent[0], extent[1], data.shape[1])
-    xx, yy = np.meshgrid(lon, lat)
-    lats = xx.reshape(data.shape[0], data.shape[1])
-    lons = yy.reshape(data.shape[0], data.shape[1])
-    return astronomy.sun_zenith_angle(fecha, lats, lons)
+    return _sun_zenith(_round_minute(fecha), tuple(map(float, extent)),
+                       data.shape[0], data.shape[1], coarse_factor)
 
 def calculate_cos_theta(fecha, extent, data):
     """
@@ -41,12 +47,61 @@ def calculate_cos_theta(fecha, extent, data):
     Returns:
         numpy.ndarray: Coseno del ángulo cenital solar corregido
     """
+    return _cos_theta(_round_minute(fecha), tuple(map(float, extent)),
+                      data.shape[0], data.shape[1])
+
+def _round_minute(fecha):
+    """
+    Redondea una fecha al minuto más cercano.
+    """
+    rounded = fecha.replace(second=0, microsecond=0)
+    if fecha.second >= 30:
+        rounded += timedelta(minutes=1)
+    return rounded
+
+def _sun_zenith(fecha, extent, nrows, ncols, coarse_factor=16):
+    """
+    Ángulo cenital solar a resolución completa a partir de la malla reducida.
+    """
+    # Con coarse_factor=1 la malla es la imagen completa: no se memoriza
+    compute = _coarse_zenith.__wrapped__ if coarse_factor == 1 else _coarse_zenith
+    zenith = compute(fecha, extent, nrows, ncols, coarse_factor)
+    if zenith.shape != (nrows, ncols):
+        # Las esquinas de ambas mallas coinciden; mode='nearest' evita que el
+        # redondeo en la última coordenada caiga fuera y tome cval=0
+        return zoom(zenith, (nrows / zenith.shape[0], ncols / zenith.shape[1]),
+                    order=1, mode='nearest')
+    return zenith.copy()
+
+@lru_cache(maxsize=64)
+def _coarse_zenith(fecha, extent, nrows, ncols, coarse_factor=16):
+    """
+    Ángulo cenital en la malla reducida, memorizado por (fecha, extent, forma).
+    Solo se guarda la malla reducida (pocos KB); la interpolación a la
+    resolución completa se repite en cada llamada.
+    """
+    # Al menos MIN_COARSE nodos por eje para que la interpolación siga
+    # siendo fina en recortes pequeños
+    coarse_rows = min(nrows, max(MIN_COARSE, -(-(nrows - 1) // coarse_factor) + 1))
+    coarse_cols = min(ncols, max(MIN_COARSE, -(-(ncols - 1) // coarse_factor) + 1))
+
+    lat = np.linspace(extent[3], extent[2], coarse_rows)
+    lon = np.linspace(extent[0], extent[1], coarse_cols)
+    lons, lats = np.meshgrid(lon, lat)
+    zenith = astronomy.sun_zenith_angle(fecha, lons, lats)
+    # El array se comparte entre llamadas
+    zenith.flags.writeable = False
+    return zenith
+
+def _cos_theta(fecha, extent, nrows, ncols):
+    """
+    Coseno del ángulo cenital a resolución completa.
+    """
     MinCosTheta = 0.019
     # Calcular coseno theta usando el ángulo cenital
-    CosTheta = np.cos(calculate_sun_zenith(fecha, extent, data)*np.pi/180.0)
+    CosTheta = np.cos(_sun_zenith(fecha, extent, nrows, ncols)*np.pi/180.0)
     CosTheta[np.where(CosTheta < MinCosTheta)] = np.nan
-
-    return np.array(CosTheta)
+    return CosTheta
 
 def calculate_rfl39(fecha, extent, data1, data2):
     """
@@ -1 +1 @@
-from .plot import single_band, sandwich_composite
\ No newline at end of file
+from .plot import single_band, single_band_batch, sandwich_composite
\ No newline at end of file
@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+from numba import njit, prange, get_num_threads
+
+# Acumuladores independientes por hilo; permiten que LLVM vectorice el bucle
+LANES = 16
+
+# Sin fastmath: la suposición 'nnan' rompería el descarte de NaN, que se
+# apoya en que toda comparación con NaN es falsa.
+@njit(parallel=True, cache=True)
+def _nan_min_max_flat(flat, nchunks):
+    n = flat.size
+    step = ((n + nchunks - 1) // nchunks + LANES - 1) // LANES * LANES
+    los = np.full((nchunks, LANES), np.inf, dtype=flat.dtype)
+    his = np.full((nchunks, LANES), -np.inf, dtype=flat.dtype)
+
+    for c in prange(nchunks):
+        lo, hi = los[c], his[c]
+        start = c * step
+        stop = min(n, start + step)
+        body = start + max(0, stop - start) // LANES * LANES
+        for i in range(start, body, LANES):
+            for j in range(LANES):
+                x = flat[i + j]
+                lo[j] = x if x < lo[j] else lo[j]
+                hi[j] = x if x > hi[j] else hi[j]
+        for i in range(body, stop):
+            x = flat[i]
+            lo[0] = x if x < lo[0] else lo[0]
+            hi[0] = x if x > hi[0] else hi[0]
+
+    return los.min(), his.max()
+
+
+def _nan_min_max(arr):
+    """
+    Mínimo y máximo ignorando NaN en una sola pasada sobre los datos.
+
+    Equivale a (np.nanmin(arr), np.nanmax(arr)) y devuelve (nan, nan) si
+    todos los valores son NaN. Se usa NumPy con un único hilo de numba
+    disponible (sus reducciones vectorizadas ganan a un recorrido escalar),
+    fuera del hilo principal y con arrays enmascarados.
+    """
+    if np.size(arr) == 0:
+        raise ValueError("No se puede calcular vmin/vmax de un array vacío.")
+    # Arrays enmascarados: NumPy respeta la máscara, el kernel no
+    if isinstance(arr, np.ma.MaskedArray):
+        return np.nanmin(arr), np.nanmax(arr)
+
+    arr = np.asarray(arr)
+    if not np.issubdtype(arr.dtype, np.floating):
+        return arr.min(), arr.max()
+
+    # Fuera del hilo principal no se usa numba: iniciar su capa de hilos
+    # (TBB) desde otro hilo deja colgado al intérprete al salir
+    if threading.current_thread() is not threading.main_thread():
+        return np.nanmin(arr), np.nanmax(arr)
+
+    nthreads = get_num_threads()
+    if nthreads == 1:
+        return np.nanmin(arr), np.nanmax(arr)
+
+    flat = np.ascontiguousarray(arr).ravel()
+    if flat.dtype == np.float16:
+        flat = flat.astype(np.float32)
+    lo, hi = _nan_min_max_flat(flat, nthreads)
+    # Ningún valor válido: los acumuladores no se movieron de ±inf
+    if lo > hi:
+        return np.nan, np.nan
+    return lo, hi
@@ -9,14 +9,19 @@ setup(
     install_requires=[
         "numpy",
         "s3fs",
-        "pathlib",
-        "Pillow",
+        "scipy",
+        "numexpr",
+        "pyproj",
+        "Pillow",  # Pillow-SIMD can replace it by hand, see README.md
         "matplotlib",
         "rasterio",
         "cadv>=1.3.0",
         "GDAL>=3.9.1",
         "cartopy>=0.24.0",
-        "netCDF4>=1.7.1",
+        "xarray",
+        "h5netcdf",
+        "dask",
+        "numba",
     ],
     python_requires=">=3.12",  # Based on Python version in nuna env
     classifiers=[
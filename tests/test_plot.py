@@ -0,0 +1,43 @@
+import numpy as np
+from PIL import Image
+
+from geosat.visualization import plot
+
+
+class RecordingCanvas:
+    """Canvas mínimo que registra los límites con los que se dibuja."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def imshow(self, data, extent, cmap=None, vmin=None, vmax=None):
+        self.calls.append((cmap, vmin, vmax))
+
+
+def test_sandwich_composite_default_limits(monkeypatch):
+    calls = []
+    monkeypatch.setattr(plot, "_get_canvas", lambda extent, dpi=150: RecordingCanvas(calls))
+    monkeypatch.setattr(plot, "_render_image", lambda canva: Image.new("RGB", (4, 4)))
+
+    data1 = np.array([[1.0, np.nan], [5.0, 3.0]])
+    data2 = np.array([[-2.0, 8.0], [np.nan, 0.5]])
+    plot.sandwich_composite(data1, data2, [-80, -70, -20, -10], save=None)
+
+    # vmax debe ser el máximo de cada banda, no su mínimo
+    assert sorted(calls, key=lambda call: call[0]) == [
+        ("gray", 1.0, 5.0),
+        ("rainbow", -2.0, 8.0),
+    ]
+
+
+def test_apply_cmap_u8_matches_matplotlib():
+    from matplotlib import colormaps
+    from matplotlib.colors import Normalize
+
+    cmap = colormaps["viridis"].resampled(1000).with_extremes(under="white", over="black")
+    data = np.linspace(-1.5, 11.5, 5001, dtype=np.float32).reshape(1, -1)
+    data[0, ::97] = np.nan
+
+    for cm in (colormaps["tab10"], cmap):
+        expected = cm(Normalize(0.0, 10.0)(data), bytes=True)
+        np.testing.assert_array_equal(plot._apply_cmap_u8(data, 0.0, 10.0, cm), expected)